@@ -7,7 +7,7 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from models import Base
+from models import Base, SEARCH_VECTOR_COLUMNS, SEARCH_INDEXES
 
 load_dotenv(override=False)
 
@@ -28,6 +28,15 @@ if config.config_file_name is not None:
 # Tell Alembic to use your models’ metadata for autogenerate
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Search columns and indexes are created by raw DDL, not by the models
+    if type_ == "column" and name in SEARCH_VECTOR_COLUMNS:
+        return False
+    if type_ == "index" and name in SEARCH_INDEXES:
+        return False
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -46,6 +55,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -67,7 +77,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""Add toggle_count and keyset index to wish_item_statuses
+
+Revision ID: 0bb890fdbbdc
+Revises: 097b917cc3f3
+Create Date: 2026-10-19 17:40:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0bb890fdbbdc'
+down_revision: Union[str, None] = '097b917cc3f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('wish_item_statuses',
+                  sa.Column('toggle_count', sa.Integer(), nullable=False, server_default='1'))
+    op.create_index('ix_wish_item_statuses_item_created_id', 'wish_item_statuses',
+                    ['item_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_wish_item_statuses_item_created_id', table_name='wish_item_statuses')
+    op.drop_column('wish_item_statuses', 'toggle_count')
@@ -0,0 +1,39 @@
+"""Add full-text and trigram search to wishlists and wish_items
+
+Revision ID: 5d2e8c41a7f3
+Revises: 0bb890fdbbdc
+Create Date: 2026-10-19 18:05:47.902115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8c41a7f3'
+down_revision: Union[str, None] = '0bb890fdbbdc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ('wishlists', 'wish_items')
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in TABLES:
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_title_trgm ON {table} USING GIN (title gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_title_trgm")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,26 @@
+"""Index wish_items.wishlist_id
+
+Revision ID: 9a4f1c7e2b6d
+Revises: 5d2e8c41a7f3
+Create Date: 2026-10-19 18:31:05.114790
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f1c7e2b6d'
+down_revision: Union[str, None] = '5d2e8c41a7f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_wish_items_wishlist_id'), 'wish_items', ['wishlist_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_wish_items_wishlist_id'), table_name='wish_items')
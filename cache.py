@@ -0,0 +1,50 @@
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import redis
+
+
+def invalidate(redis_client: redis.Redis, *keys: str):
+    # Один UNLINK на всі ключі: один round-trip, звільнення пам'яті - у фоні на стороні Redis
+    if keys:
+        redis_client.unlink(*keys)
+
+
+def get_many(redis_client: redis.Redis, keys: List[str]) -> List[Optional[Any]]:
+    if not keys:
+        return []
+    return [json.loads(value) if value else None for value in redis_client.mget(keys)]
+
+
+def set_many(redis_client: redis.Redis, values: Dict[str, Any], ttl: int):
+    if not values:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for key, value in values.items():
+        pipe.setex(key, ttl, json.dumps(value))
+    pipe.execute()
+
+
+def get_or_load_many(
+        redis_client: redis.Redis,
+        ids: Iterable[int],
+        key: Callable[[int], str],
+        load: Callable[[List[int]], Dict[int, Any]],
+        ttl: int
+) -> List[Any]:
+    """Читає записи з кешу одним MGET, відсутні довантажує через load(ids) і кладе
+    в кеш одним пайплайном. Порядок відповідає ids, неіснуючі записи пропускаються."""
+    ids = list(ids)
+    cached = get_many(redis_client, [key(entity_id) for entity_id in ids])
+
+    missing = [entity_id for entity_id, value in zip(ids, cached) if value is None]
+    loaded = load(missing) if missing else {}
+    set_many(redis_client, {key(entity_id): value for entity_id, value in loaded.items()}, ttl)
+
+    result = []
+    for entity_id, value in zip(ids, cached):
+        if value is None:
+            value = loaded.get(entity_id)
+        if value is not None:
+            result.append(value)
+    return result
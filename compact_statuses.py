@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from crud import compact_item_statuses
+
+load_dotenv(override=False)
+
+# Історія, старша за цей термін, згортається в підсумкові рядки
+STATUS_RETENTION_DAYS = int(os.getenv("STATUS_RETENTION_DAYS", 90))
+
+
+def main():
+    older_than = datetime.now(timezone.utc) - timedelta(days=STATUS_RETENTION_DAYS)
+    db = SessionLocal()
+    try:
+        removed = compact_item_statuses(db, older_than)
+    finally:
+        db.close()
+    print(f"🧹 Compacted item status history older than {older_than.isoformat()}: {removed} rows removed")
+
+
+if __name__ == "__main__":
+    main()
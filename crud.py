@@ -1,9 +1,12 @@
-from typing import List, Type, Optional
+import re
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import delete, func, select, text, tuple_, update
 from sqlalchemy.orm import Session, joinedload
 from models import User, WishList, WishItem, WishItemStatus
 from schemas import UserCreate, WishListCreate, WishItemCreate
+from dto import WishListRow, WishItemRow, WishItemStatusRow, SearchResultRow
 from auth import get_password_hash
 
 
@@ -36,13 +39,6 @@ def create_wishlist(db: Session, wishlist: WishListCreate, user_id: int):
     return db_wishlist
 
 
-def get_wishlists(db: Session, include_items: bool = False) -> list[Type[WishList]]:
-    query = db.query(WishList).options(joinedload(WishList.owner))
-    if include_items:
-        query = query.options(joinedload(WishList.items))
-    return query.all()
-
-
 def get_wishlist_by_id(db: Session, wishlist_id: int, include_items: bool = True) -> Optional[WishList]:
     query = db.query(WishList).options(joinedload(WishList.owner))
     if include_items:
@@ -62,18 +58,6 @@ def add_wish_item(db: Session, item: WishItemCreate, wishlist_id: int):
     db.refresh(db_item)
     return db_item
 
-def get_wish_items(db: Session, wishlist_id: int):
-    items = db.query(WishItem).filter(WishItem.wishlist_id == wishlist_id).all()
-
-    for item in items:
-        if item.statuses:
-            latest_status = max(item.statuses, key=lambda s: s.created_at)
-            item.is_marked = latest_status.marked
-        else:
-            item.is_marked = False
-
-    return items
-
 
 def mark_item_status(db: Session, item_id: int, user_id: int):
     last_status = db.query(WishItemStatus).filter(
@@ -94,8 +78,271 @@ def mark_item_status(db: Session, item_id: int, user_id: int):
     return db_status
 
 
-def get_item_statuses(db: Session, item_id: int):
-    return db.query(WishItemStatus).options(
-        joinedload(WishItemStatus.user)).filter(
-        WishItemStatus.item_id == item_id).order_by(
-        WishItemStatus.created_at.desc()).all()
+# --- Легкі запити для читання: лише потрібні колонки, без ORM-гідрації ---
+
+def _wishlist_rows_query():
+    # Корельований підрахунок: рахуються лише товари вибраних списків (індекс по wishlist_id)
+    items_count = select(func.count(WishItem.id)).where(
+        WishItem.wishlist_id == WishList.id
+    ).correlate(WishList).scalar_subquery()
+
+    return select(
+        WishList.id,
+        WishList.title,
+        WishList.description,
+        WishList.user_id,
+        WishList.created_at,
+        User.full_name,
+        items_count
+    ).outerjoin(User, User.id == WishList.user_id)
+
+
+def get_wishlist_rows(db: Session, user_id: Optional[int] = None) -> List[WishListRow]:
+    query = _wishlist_rows_query()
+    if user_id is not None:
+        query = query.where(WishList.user_id == user_id)
+    return [WishListRow(*row) for row in db.execute(query.order_by(WishList.id))]
+
+
+def get_wishlist_rows_by_ids(db: Session, wishlist_ids: List[int]) -> List[WishListRow]:
+    query = _wishlist_rows_query().where(WishList.id.in_(wishlist_ids))
+    return [WishListRow(*row) for row in db.execute(query)]
+
+
+def get_wishlist_row(db: Session, wishlist_id: int) -> Optional[WishListRow]:
+    row = db.execute(_wishlist_rows_query().where(WishList.id == wishlist_id)).first()
+    return WishListRow(*row) if row else None
+
+
+def _latest_statuses_subquery(wishlist_id: int):
+    # Історія лише товарів цього списку: фільтр усередині, бо крізь віконну функцію
+    # Postgres умову з зовнішнього запиту не проштовхне. Сортування - по індексу (item_id, created_at, id)
+    list_items = select(WishItem.id).where(WishItem.wishlist_id == wishlist_id)
+    return select(
+        WishItemStatus.item_id,
+        WishItemStatus.user_id,
+        WishItemStatus.marked,
+        WishItemStatus.created_at,
+        func.row_number().over(
+            partition_by=WishItemStatus.item_id,
+            order_by=(WishItemStatus.created_at.desc(), WishItemStatus.id.desc())
+        ).label("rn")
+    ).where(WishItemStatus.item_id.in_(list_items)).subquery()
+
+
+def _wish_item_rows_query(wishlist_id: int):
+    latest = _latest_statuses_subquery(wishlist_id)
+    return select(
+        WishItem.id,
+        WishItem.title,
+        WishItem.description,
+        WishItem.priority,
+        WishItem.wishlist_id,
+        WishItem.created_at,
+        latest.c.marked,
+        User.full_name,
+        latest.c.created_at
+    ).outerjoin(
+        latest, (latest.c.item_id == WishItem.id) & (latest.c.rn == 1)
+    ).outerjoin(User, User.id == latest.c.user_id).where(
+        WishItem.wishlist_id == wishlist_id).order_by(WishItem.id)
+
+
+def _wish_item_row(row) -> WishItemRow:
+    item_id, title, description, priority, wishlist_id, created_at, marked, marked_by, marked_at = row
+    if not marked:
+        return WishItemRow(item_id, title, description, priority, wishlist_id, created_at, False, None, None)
+    return WishItemRow(item_id, title, description, priority, wishlist_id, created_at, True, marked_by, marked_at)
+
+
+def get_wish_item_rows(db: Session, wishlist_id: int) -> List[WishItemRow]:
+    return [_wish_item_row(row) for row in db.execute(_wish_item_rows_query(wishlist_id))]
+
+
+def get_wishlist_with_items(db: Session, wishlist_id: int) -> Optional[Tuple[WishListRow, List[WishItemRow]]]:
+    # Як selectinload, але на проекціях: рядок списку, далі товари з поточним статусом за wishlist_id
+    wishlist = get_wishlist_row(db, wishlist_id)
+    if wishlist is None:
+        return None
+    return wishlist, get_wish_item_rows(db, wishlist_id)
+
+
+def wish_item_exists(db: Session, wishlist_id: int, item_id: int) -> bool:
+    return db.execute(select(WishItem.id).where(
+        WishItem.id == item_id,
+        WishItem.wishlist_id == wishlist_id
+    )).first() is not None
+
+
+def _comparable_datetime(db: Session, value):
+    # SQLite зберігає func.now() як 'YYYY-MM-DD HH:MM:SS', а datetime-параметри - з мікросекундами,
+    # і порівнює їх як рядки. Приводимо обидві сторони до одного формату
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", value)
+    return value
+
+
+def _item_status_rows_query(db: Session, item_id: int, since: Optional[datetime] = None,
+                            until: Optional[datetime] = None):
+    created_at = _comparable_datetime(db, WishItemStatus.created_at)
+    query = select(
+        WishItemStatus.id,
+        WishItemStatus.item_id,
+        WishItemStatus.user_id,
+        WishItemStatus.marked,
+        WishItemStatus.created_at,
+        User.full_name,
+        WishItemStatus.toggle_count
+    ).outerjoin(User, User.id == WishItemStatus.user_id).where(
+        WishItemStatus.item_id == item_id)
+    if since is not None:
+        query = query.where(created_at >= _comparable_datetime(db, since))
+    if until is not None:
+        query = query.where(created_at < _comparable_datetime(db, until))
+    return query.order_by(WishItemStatus.created_at.desc(), WishItemStatus.id.desc())
+
+
+def get_item_status_page(db: Session, item_id: int, limit: int,
+                         after: Optional[Tuple[datetime, int]] = None,
+                         since: Optional[datetime] = None,
+                         until: Optional[datetime] = None) -> List[WishItemStatusRow]:
+    # Keyset-пагінація по (created_at, id): after - ключ останнього рядка попередньої сторінки
+    query = _item_status_rows_query(db, item_id, since, until)
+    if after is not None:
+        after_created_at, after_id = after
+        query = query.where(tuple_(_comparable_datetime(db, WishItemStatus.created_at), WishItemStatus.id)
+                            < tuple_(_comparable_datetime(db, after_created_at), after_id))
+    return [WishItemStatusRow(*row) for row in db.execute(query.limit(limit))]
+
+
+# --- Потокове читання: серверний курсор, рядки віддаються пачками ---
+
+STREAM_BATCH_SIZE = 1000
+
+
+def iter_wish_item_row_batches(db: Session, wishlist_id: int,
+                               batch_size: int = STREAM_BATCH_SIZE) -> Iterator[List[WishItemRow]]:
+    query = _wish_item_rows_query(wishlist_id)
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [_wish_item_row(row) for row in partition]
+
+
+def iter_item_status_row_batches(db: Session, item_id: int,
+                                 since: Optional[datetime] = None,
+                                 until: Optional[datetime] = None,
+                                 batch_size: int = STREAM_BATCH_SIZE) -> Iterator[List[WishItemStatusRow]]:
+    query = _item_status_rows_query(db, item_id, since, until)
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [WishItemStatusRow(*row) for row in partition]
+
+
+# --- Компактизація історії статусів ---
+
+COMPACT_CHUNK_SIZE = 1000
+
+
+def compact_item_statuses(db: Session, older_than: datetime) -> int:
+    """Згортає послідовні перемикання одного користувача, старші за older_than,
+    в один рядок: лишається останній рядок серії, toggle_count накопичує кількість.
+    Повертає кількість видалених рядків."""
+    item_ids = db.execute(
+        select(WishItemStatus.item_id).where(
+            WishItemStatus.created_at < older_than
+        ).group_by(WishItemStatus.item_id).having(func.count(WishItemStatus.id) > 1)
+    ).scalars().all()
+
+    removed = 0
+    for item_id in item_ids:
+        rows = db.execute(
+            select(WishItemStatus.id, WishItemStatus.user_id, WishItemStatus.toggle_count).where(
+                WishItemStatus.item_id == item_id,
+                WishItemStatus.created_at < older_than
+            ).order_by(WishItemStatus.created_at, WishItemStatus.id)
+        ).all()
+
+        to_delete = []
+        to_update = []
+        run_id, run_user, run_count = rows[0]
+        run_merged = False
+        for status_id, user_id, toggle_count in rows[1:]:
+            if user_id == run_user:
+                to_delete.append(run_id)
+                run_count += toggle_count
+                run_id = status_id
+                run_merged = True
+                continue
+            if run_merged:
+                to_update.append({"id": run_id, "toggle_count": run_count})
+            run_id, run_user, run_count = status_id, user_id, toggle_count
+            run_merged = False
+        if run_merged:
+            to_update.append({"id": run_id, "toggle_count": run_count})
+
+        if to_delete:
+            db.execute(update(WishItemStatus), to_update)
+            for start in range(0, len(to_delete), COMPACT_CHUNK_SIZE):
+                chunk = to_delete[start:start + COMPACT_CHUNK_SIZE]
+                db.execute(delete(WishItemStatus).where(WishItemStatus.id.in_(chunk)))
+            db.commit()
+            removed += len(to_delete)
+
+    return removed
+
+
+# --- Пошук ---
+
+# тип результату -> (таблиця, колонка з id списку)
+SEARCH_TABLES = {
+    "wishlist": ("wishlists", "id"),
+    "item": ("wish_items", "wishlist_id"),
+}
+
+
+def _postgres_search_query(table: str, wishlist_column: str):
+    return text(f"""
+        SELECT id, {wishlist_column}, title, description,
+               ts_rank(search_vector, websearch_to_tsquery('simple', :q)) + similarity(title, :q) AS rank
+        FROM {table}
+        WHERE search_vector @@ websearch_to_tsquery('simple', :q) OR title % :q
+        ORDER BY rank DESC, id
+        LIMIT :limit
+    """)
+
+
+def _sqlite_search_query(table: str, wishlist_column: str):
+    fts = f"{table}_fts"
+    return text(f"""
+        SELECT t.id, t.{wishlist_column}, t.title, t.description, -bm25({fts}) AS rank
+        FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH :q
+        ORDER BY rank DESC, t.id
+        LIMIT :limit
+    """)
+
+
+def _fts5_query(q: str) -> str:
+    # Кожне слово - префіксний пошук у лапках, щоб ввід користувача не ламав синтаксис MATCH
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", q))
+
+
+def search(db: Session, q: str, types: List[str], limit: int, offset: int = 0) -> List[SearchResultRow]:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        q = _fts5_query(q)
+        if not q:
+            return []
+        build_query = _sqlite_search_query
+    else:
+        build_query = _postgres_search_query
+
+    # Кожен тип дає свої найкращі offset + limit результатів, далі спільне ранжування
+    results = []
+    for result_type in types:
+        table, wishlist_column = SEARCH_TABLES[result_type]
+        rows = db.execute(build_query(table, wishlist_column), {"q": q, "limit": offset + limit})
+        results.extend(SearchResultRow(result_type, *row) for row in rows)
+
+    results.sort(key=lambda result: result.rank, reverse=True)
+    return results[offset:offset + limit]
@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import logging
 import os
 
 
@@ -26,7 +27,32 @@ if not DATABASE_URL:
     DB_NAME = os.getenv("DB_NAME", "wishlist_db")
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
+# Пул з'єднань на один воркер: загальна кількість з'єднань усіх воркерів
+# (pool_size + max_overflow) не перевищує DB_MAX_CONNECTIONS
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 80))
+_per_worker = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", max(1, _per_worker // 2)))
+# Від'ємний max_overflow QueuePool трактує як необмежений, тому не нижче 0
+DB_MAX_OVERFLOW = max(0, int(os.getenv("DB_MAX_OVERFLOW", _per_worker - DB_POOL_SIZE)))
+
+if WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) > DB_MAX_CONNECTIONS:
+    logging.getLogger(__name__).warning(
+        "%s workers x (pool_size %s + max_overflow %s) exceeds DB_MAX_CONNECTIONS=%s",
+        WEB_CONCURRENCY, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_MAX_CONNECTIONS
+    )
+
+if DATABASE_URL.startswith("sqlite"):
+    # Тестова збірка: пошук працює через FTS5 замість tsvector
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
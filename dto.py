@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+@dataclass(slots=True)
+class WishListRow:
+    id: int
+    title: str
+    description: Optional[str]
+    user_id: int
+    created_at: Optional[datetime]
+    owner_name: Optional[str]
+    items_count: int
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "user_id": self.user_id,
+            "created_at": _iso(self.created_at),
+            "owner_name": self.owner_name,
+            "items_count": self.items_count
+        }
+
+
+@dataclass(slots=True)
+class WishItemRow:
+    id: int
+    title: str
+    description: Optional[str]
+    priority: int
+    wishlist_id: int
+    created_at: Optional[datetime]
+    is_marked: bool
+    marked_by: Optional[str]
+    marked_at: Optional[datetime]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "priority": self.priority,
+            "wishlist_id": self.wishlist_id,
+            "created_at": _iso(self.created_at),
+            "is_marked": self.is_marked,
+            "marked_by": self.marked_by,
+            "marked_at": _iso(self.marked_at)
+        }
+
+
+@dataclass(slots=True)
+class WishItemStatusRow:
+    id: int
+    item_id: int
+    user_id: int
+    marked: bool
+    created_at: Optional[datetime]
+    user_name: Optional[str]
+    toggle_count: int
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "item_id": self.item_id,
+            "user_id": self.user_id,
+            "marked": self.marked,
+            "created_at": _iso(self.created_at),
+            "user_name": self.user_name,
+            "toggle_count": self.toggle_count
+        }
+
+
+@dataclass(slots=True)
+class SearchResultRow:
+    type: str
+    id: int
+    wishlist_id: int
+    title: str
+    description: Optional[str]
+    rank: float
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "id": self.id,
+            "wishlist_id": self.wishlist_id,
+            "title": self.title,
+            "description": self.description,
+            "rank": self.rank
+        }
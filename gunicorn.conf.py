@@ -0,0 +1,37 @@
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv(override=False)
+
+# Production launcher: gunicorn -c gunicorn.conf.py main:app
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# One uvicorn worker per core (plus one), unless overridden,
+# capped so that every worker gets at least two DB connections (see database.py)
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() + 1))
+workers = max(1, min(workers, int(os.getenv("DB_MAX_CONNECTIONS", 80)) // 2))
+
+# UvicornWorker uses loop="auto" and http="auto",
+# so uvloop/httptools are picked up when installed (uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+
+keepalive = int(os.getenv("KEEPALIVE", 5))
+backlog = int(os.getenv("BACKLOG", 2048))
+timeout = int(os.getenv("TIMEOUT", 60))
+
+# On SIGTERM workers stop accepting connections and finish in-flight requests
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+
+# Recycle workers periodically to keep memory in check
+max_requests = int(os.getenv("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 1000))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Workers inherit this, database.py uses it to split DB_MAX_CONNECTIONS between them
+os.environ["WEB_CONCURRENCY"] = str(workers)
@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Any, Optional
+
+import redis
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from rate_limit import optional_oauth2_scheme, token_subject
+
+# Скільки зберігається відповідь для повтору та скільки живе блокування дубліката в обробці
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+IDEMPOTENCY_LOCK_TTL_MS = int(os.getenv("IDEMPOTENCY_LOCK_TTL_MS", 10000))
+MAX_KEY_LENGTH = 255
+
+
+class IdempotentReplay(Exception):
+    def __init__(self, status_code: int, body: Any):
+        self.status_code = status_code
+        self.body = body
+
+
+def replay_response(exc: IdempotentReplay) -> JSONResponse:
+    return JSONResponse(status_code=exc.status_code, content=exc.body, headers={"Idempotent-Replayed": "true"})
+
+
+class IdempotencyContext:
+    def __init__(self, redis_client: Optional[redis.Redis] = None, key: Optional[str] = None):
+        self.redis_client = redis_client
+        self.key = key
+
+    def save(self, body: Any, status_code: int = 200):
+        if self.key is None:
+            return body
+        try:
+            self.redis_client.setex(
+                f"idempotency:{self.key}", IDEMPOTENCY_TTL,
+                json.dumps({"status_code": status_code, "body": jsonable_encoder(body)})
+            )
+        except redis.RedisError:
+            pass
+        return body
+
+
+class Idempotency:
+    """Залежність FastAPI для заголовка Idempotency-Key.
+
+    Збережена відповідь повертається через IdempotentReplay ще до автентифікації в БД,
+    паралельний дублікат отримує 409, поки перший запит не завершиться.
+    Має стояти в сигнатурі ендпоінта перед get_current_user і get_db."""
+
+    def __init__(self, redis_client: redis.Redis, scope: str):
+        self.redis_client = redis_client
+        self.scope = scope
+
+    async def __call__(
+            self,
+            request: Request,
+            idempotency_key: Optional[str] = Header(None),
+            token: Optional[str] = Depends(optional_oauth2_scheme)
+    ):
+        subject = token_subject(token)
+        if not idempotency_key or subject is None:
+            yield IdempotencyContext()
+            return
+
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+        key = f"{self.scope}:{subject}:{request.url.path}:{idempotency_key}"
+        lock_key = f"idempotency_lock:{key}"
+        try:
+            stored = self.redis_client.get(f"idempotency:{key}")
+            if stored:
+                stored = json.loads(stored)
+                raise IdempotentReplay(stored["status_code"], stored["body"])
+            locked = self.redis_client.set(lock_key, 1, nx=True, px=IDEMPOTENCY_LOCK_TTL_MS)
+        except redis.RedisError:
+            # Redis недоступний - обробляємо запит як звичайний
+            yield IdempotencyContext()
+            return
+
+        if not locked:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is already in progress",
+                headers={"Retry-After": "1"},
+            )
+
+        try:
+            yield IdempotencyContext(self.redis_client, key)
+        finally:
+            try:
+                self.redis_client.delete(lock_key)
+            except redis.RedisError:
+                pass
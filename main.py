@@ -1,26 +1,34 @@
 import os
 import json
+import base64
 import redis
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Literal, Optional, Tuple
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from database import get_db, engine
+from database import get_db, engine, SessionLocal
 from models import Base, User, WishList, WishItem, WishItemStatus
 from schemas import (
     UserCreate, UserResponse, Token, WishListCreate, WishListResponse,
-    WishItemCreate, WishItemResponse, WishItemStatusResponse
+    WishItemCreate, WishItemResponse, WishItemStatusResponse, SearchResult,
+    WishListWithItemsResponse
 )
 from auth import authenticate_user, create_access_token, get_current_user
+from rate_limit import RateLimiter, ConcurrencyLimiter, AUTH_CONCURRENCY, get_rejection_metrics
+from idempotency import Idempotency, IdempotencyContext, IdempotentReplay, replay_response
+from cache import invalidate, set_many, get_or_load_many
 from crud import (
-    create_user, get_user_by_email, create_wishlist, get_wishlists,
-    get_wishlist_by_id, add_wish_item, get_wish_items, mark_item_status,
-    get_item_statuses
+    create_user, get_user_by_email, create_wishlist, get_wishlist_by_id,
+    add_wish_item, mark_item_status, get_wishlist_rows,
+    get_wish_item_rows, get_item_status_page, wish_item_exists, get_wishlist_rows_by_ids,
+    get_wishlist_with_items,
+    iter_wish_item_row_batches, iter_item_status_row_batches, search, SEARCH_TABLES
 )
 
 # Створюємо таблиці
@@ -58,8 +66,71 @@ redis_client = redis.from_url(REDIS_URL, decode_responses=True)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Обмеження навантаження
+login_rate_limit = RateLimiter(redis_client, "login", scopes=("ip",))
+register_rate_limit = RateLimiter(redis_client, "register", scopes=("ip",))
+add_item_rate_limit = RateLimiter(redis_client, "add_item")
+mark_item_rate_limit = RateLimiter(redis_client, "mark_item")
+delete_item_rate_limit = RateLimiter(redis_client, "delete_item")
+auth_concurrency = ConcurrencyLimiter(redis_client, "auth", limit=AUTH_CONCURRENCY)
+write_concurrency = ConcurrencyLimiter(redis_client, "write")
 
-@app.post("/register", response_model=UserResponse)
+# Idempotency-Key для безпечних повторів запитів клієнтами
+add_item_idempotency = Idempotency(redis_client, "add_item")
+delete_item_idempotency = Idempotency(redis_client, "delete_item")
+mark_item_idempotency = Idempotency(redis_client, "mark_item")
+
+
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay_handler(request, exc: IdempotentReplay):
+    return replay_response(exc)
+
+STATUS_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def stream_json_array(iter_batches, *args):
+    # Окрема сесія: залежність get_db може закритися раніше, ніж відповідь буде дочитана
+    def generate():
+        db = SessionLocal()
+        try:
+            yield "["
+            first = True
+            for batch in iter_batches(db, *args):
+                if not batch:
+                    continue
+                chunk = ",".join(json.dumps(row.to_dict()) for row in batch)
+                yield chunk if first else "," + chunk
+                first = False
+            yield "]"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/json")
+
+
+def load_wishlists(db: Session, wishlist_ids: List[int]) -> List[dict]:
+    # Окремі записи wishlist_{id} читаються одним MGET, відсутні - одним запитом до БД
+    return get_or_load_many(
+        redis_client, wishlist_ids, "wishlist_{}".format,
+        lambda ids: {row.id: row.to_dict() for row in get_wishlist_rows_by_ids(db, ids)},
+        300
+    )
+
+
+@app.post("/register", response_model=UserResponse,
+          dependencies=[Depends(register_rate_limit), Depends(auth_concurrency)])
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = get_user_by_email(db, email=user.email)
     if db_user:
@@ -70,7 +141,8 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     return create_user(db=db, user=user)
 
 
-@app.post("/token", response_model=Token)
+@app.post("/token", response_model=Token,
+          dependencies=[Depends(login_rate_limit), Depends(auth_concurrency)])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
@@ -98,7 +170,7 @@ async def create_new_wishlist(
         db: Session = Depends(get_db)
 ):
     new_wishlist = create_wishlist(db=db, wishlist=wishlist, user_id=current_user.id)
-    redis_client.delete("all_wishlists")
+    invalidate(redis_client, "all_wishlists", f"user_{current_user.id}_wishlists")
     return new_wishlist
 
 
@@ -108,11 +180,12 @@ async def get_all_wishlists(db: Session = Depends(get_db)):
     if cached_wishlists:
         return json.loads(cached_wishlists)
 
-    wishlists = get_wishlists(db)
+    wishlists = [wishlist.to_dict() for wishlist in get_wishlist_rows(db)]
 
-    redis_client.setex("all_wishlists", 300, json.dumps(
-        [wishlist.to_dict() for wishlist in wishlists]
-    ))
+    # Разом зі списком кешуємо і кожен список окремо - для мульти-читання через MGET
+    cached = {f"wishlist_{wishlist['id']}": wishlist for wishlist in wishlists}
+    cached["all_wishlists"] = wishlists
+    set_many(redis_client, cached, 300)
     return wishlists
 
 
@@ -124,29 +197,50 @@ async def get_my_wishlists(
     cached = redis_client.get(f"user_{current_user.id}_wishlists")
     if cached:
         return json.loads(cached)
-    wishlists = db.query(WishList).filter(WishList.user_id == current_user.id).all()
-    redis_client.setex(f"user_{current_user.id}_wishlists", 300,
-                       json.dumps([wishlist.to_dict() for wishlist in wishlists]))
+    wishlists = [wishlist.to_dict() for wishlist in get_wishlist_rows(db, user_id=current_user.id)]
+    redis_client.setex(f"user_{current_user.id}_wishlists", 300, json.dumps(wishlists))
 
     return wishlists
 
 
 @app.get("/wishlists/{wishlist_id}", response_model=WishListResponse)
 async def get_wishlist(wishlist_id: int, db: Session = Depends(get_db)):
-    wishlist = get_wishlist_by_id(db, wishlist_id)
-    if wishlist is None:
+    wishlists = load_wishlists(db, [wishlist_id])
+    if not wishlists:
         raise HTTPException(status_code=404, detail="Wishlist not found")
-    return wishlist
+    return wishlists[0]
 
 
-@app.post("/wishlists/{wishlist_id}/items", response_model=WishItemResponse)
+@app.get("/wishlists/{wishlist_id}/full", response_model=WishListWithItemsResponse)
+async def get_wishlist_full(wishlist_id: int, db: Session = Depends(get_db)):
+    # Список разом з товарами та їх поточною позначкою - один запит клієнта, один ключ у кеші
+    cached = redis_client.get(f"wishlist_full_{wishlist_id}")
+    if cached:
+        return json.loads(cached)
+
+    result = get_wishlist_with_items(db, wishlist_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Wishlist not found")
+
+    wishlist, items = result
+    wishlist_full = wishlist.to_dict()
+    wishlist_full["items_count"] = len(items)
+    wishlist_full["items"] = [item.to_dict() for item in items]
+
+    redis_client.setex(f"wishlist_full_{wishlist_id}", 180, json.dumps(wishlist_full))
+    return wishlist_full
+
+
+@app.post("/wishlists/{wishlist_id}/items", response_model=WishItemResponse,
+          dependencies=[Depends(add_item_rate_limit), Depends(write_concurrency)])
 async def add_item_to_wishlist(
         wishlist_id: int,
         item: WishItemCreate,
+        idempotency: IdempotencyContext = Depends(add_item_idempotency),
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+    wishlist = get_wishlist_by_id(db, wishlist_id, include_items=False)
     if wishlist is None:
         raise HTTPException(status_code=404, detail="Wishlist not found")
 
@@ -155,16 +249,18 @@ async def add_item_to_wishlist(
 
     new_item = add_wish_item(db=db, item=item, wishlist_id=wishlist_id)
 
-    redis_client.delete(f"wishlist_items_{wishlist_id}")
-    redis_client.delete("all_wishlists")
+    invalidate(redis_client, f"wishlist_items_{wishlist_id}", f"wishlist_{wishlist_id}",
+               f"wishlist_full_{wishlist_id}", "all_wishlists", f"user_{current_user.id}_wishlists")
 
-    return new_item
+    return idempotency.save(WishItemResponse.model_validate(new_item))
 
 
-@app.delete("/wishlists/{wishlist_id}/items/{item_id}", response_model=WishItemResponse)
+@app.delete("/wishlists/{wishlist_id}/items/{item_id}", response_model=WishItemResponse,
+            dependencies=[Depends(delete_item_rate_limit), Depends(write_concurrency)])
 async def delete_item_from_wishlist(
         wishlist_id: int,
         item_id: int,
+        idempotency: IdempotencyContext = Depends(delete_item_idempotency),
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
@@ -185,41 +281,42 @@ async def delete_item_from_wishlist(
     db.delete(item)
     db.commit()
 
-    redis_client.delete(f"wishlist_items_{wishlist_id}")
-    redis_client.delete("all_wishlists")
+    invalidate(redis_client, f"wishlist_items_{wishlist_id}", f"wishlist_{wishlist_id}",
+               f"wishlist_full_{wishlist_id}", "all_wishlists", f"user_{current_user.id}_wishlists")
 
-    return item
+    return idempotency.save(WishItemResponse.model_validate(item))
 
 
 @app.get("/wishlists/{wishlist_id}/items", response_model=List[WishItemResponse])
-async def get_wishlist_items(wishlist_id: int, db: Session = Depends(get_db)):
+async def get_wishlist_items(wishlist_id: int, stream: bool = False, db: Session = Depends(get_db)):
+    if stream:
+        return stream_json_array(iter_wish_item_row_batches, wishlist_id)
+
     cached_items = redis_client.get(f"wishlist_items_{wishlist_id}")
     if cached_items:
         return json.loads(cached_items)
 
-    items = get_wish_items(db, wishlist_id)
+    items = [item.to_dict() for item in get_wish_item_rows(db, wishlist_id)]
 
-    redis_client.setex(f"wishlist_items_{wishlist_id}", 180, json.dumps(
-        [item.to_dict() for item in items]
-    ))
+    redis_client.setex(f"wishlist_items_{wishlist_id}", 180, json.dumps(items))
 
     return items
 
 
-@app.post("/wishlists/{wishlist_id}/items/{item_id}/mark")
+@app.post("/wishlists/{wishlist_id}/items/{item_id}/mark",
+          dependencies=[Depends(mark_item_rate_limit), Depends(write_concurrency)])
 async def mark_item(
         wishlist_id: int,
         item_id: int,
+        idempotency: IdempotencyContext = Depends(mark_item_idempotency),
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+    wishlist = get_wishlist_by_id(db, wishlist_id, include_items=False)
     if wishlist is None:
         raise HTTPException(status_code=404, detail="Wishlist not found")
 
-    items = get_wish_items(db, wishlist_id)
-    item_exists = any(item.id == item_id for item in items)
-    if not item_exists:
+    if not wish_item_exists(db, wishlist_id, item_id):
         raise HTTPException(status_code=404, detail="Item not found")
 
     status_record = mark_item_status(
@@ -228,38 +325,69 @@ async def mark_item(
         user_id=current_user.id
     )
 
-    redis_client.delete(f"wishlist_items_{wishlist_id}")
-    redis_client.delete(f"item_statuses_{item_id}")
+    invalidate(redis_client, f"wishlist_items_{wishlist_id}", f"wishlist_full_{wishlist_id}",
+               f"item_statuses_{item_id}")
 
-    return {"message": "Item status updated", "marked": status_record.marked}
+    return idempotency.save({"message": "Item status updated", "marked": status_record.marked})
 
 
 @app.get("/wishlists/{wishlist_id}/items/{item_id}/statuses", response_model=List[WishItemStatusResponse])
 async def get_item_status_history(
         wishlist_id: int,
         item_id: int,
+        response: Response,
+        limit: int = Query(STATUS_PAGE_SIZE, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        stream: bool = False,
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+    wishlist = get_wishlist_by_id(db, wishlist_id, include_items=False)
     if wishlist is None:
         raise HTTPException(status_code=404, detail="Wishlist not found")
 
     if wishlist.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    cached_statuses = redis_client.get(f"item_statuses_{item_id}")
-    if cached_statuses:
-        return json.loads(cached_statuses)
+    if stream:
+        # Повертаємо з'єднання в пул одразу: стрим відкриває власну сесію
+        db.close()
+        return stream_json_array(iter_item_status_row_batches, item_id, since, until)
 
-    statuses = get_item_statuses(db, item_id)
-    serialized_statuses = [status.to_dict() for status in statuses]
+    # У кеші лише перша сторінка без фільтрів
+    first_page = cursor is None and since is None and until is None and limit == STATUS_PAGE_SIZE
 
-    redis_client.setex(f"item_statuses_{item_id}", 120, json.dumps(serialized_statuses))
+    cached_statuses = redis_client.get(f"item_statuses_{item_id}") if first_page else None
+    if cached_statuses:
+        serialized_statuses = json.loads(cached_statuses)
+    else:
+        after = decode_cursor(cursor) if cursor else None
+        statuses = get_item_status_page(db, item_id, limit, after=after, since=since, until=until)
+        serialized_statuses = [status.to_dict() for status in statuses]
+        if first_page:
+            redis_client.setex(f"item_statuses_{item_id}", 120, json.dumps(serialized_statuses))
+
+    if len(serialized_statuses) == limit:
+        last = serialized_statuses[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
 
     return serialized_statuses
 
 
+@app.get("/search", response_model=List[SearchResult])
+async def search_wishlists(
+        q: str = Query(..., min_length=1, max_length=200),
+        type: Optional[Literal["wishlist", "item"]] = None,
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0, le=1000),
+        db: Session = Depends(get_db)
+):
+    types = [type] if type else list(SEARCH_TABLES)
+    return [result.to_dict() for result in search(db, q, types, limit, offset)]
+
+
 @app.get("/health")
 async def health_check():
     try:
@@ -275,6 +403,16 @@ async def health_check():
     }
 
 
+
+@app.get("/metrics")
+async def metrics():
+    try:
+        rejections = get_rejection_metrics(redis_client)
+    except redis.RedisError:
+        rejections = {}
+    return {"rejections": rejections}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
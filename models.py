@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -45,17 +45,6 @@ class WishList(Base):
     def items_count(self):
         return len(self.items) if self.items else 0
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "user_id": self.user_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "owner_name": self.owner.full_name if self.owner else None,
-            "items_count": len(self.items) if self.items else 0
-        }
-
 
 class WishItem(Base):
     __tablename__ = "wish_items"
@@ -64,36 +53,12 @@ class WishItem(Base):
     title = Column(String, index=True)
     description = Column(Text)
     priority = Column(Integer, default=1)
-    wishlist_id = Column(Integer, ForeignKey("wishlists.id"))
+    wishlist_id = Column(Integer, ForeignKey("wishlists.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     wishlist = relationship("WishList", back_populates="items")
     statuses = relationship("WishItemStatus", back_populates="item", cascade="all, delete-orphan")
 
-    def to_dict(self):
-        is_marked = False
-        marked_by = None
-        marked_at = None
-
-        if self.statuses:
-            latest_status = max(self.statuses, key=lambda x: x.created_at)
-            is_marked = latest_status.marked
-            if is_marked:
-                marked_by = latest_status.user.full_name if latest_status.user else None
-                marked_at = latest_status.created_at.isoformat() if latest_status.created_at else None
-
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "priority": self.priority,
-            "wishlist_id": self.wishlist_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "is_marked": is_marked,
-            "marked_by": marked_by,
-            "marked_at": marked_at
-        }
-
 
 class WishItemStatus(Base):
     __tablename__ = "wish_item_statuses"
@@ -102,17 +67,56 @@ class WishItemStatus(Base):
     item_id = Column(Integer, ForeignKey("wish_items.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
     marked = Column(Boolean)
+    # Скільки перемикань представляє рядок (>1 після компактизації історії)
+    toggle_count = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     item = relationship("WishItem", back_populates="statuses")
     user = relationship("User", back_populates="item_statuses")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "item_id": self.item_id,
-            "user_id": self.user_id,
-            "marked": self.marked,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "user_name": self.user.full_name if self.user else None
-        }
\ No newline at end of file
+    __table_args__ = (
+        Index("ix_wish_item_statuses_item_created_id", "item_id", "created_at", "id"),
+    )
+
+
+# --- Повнотекстовий пошук ---
+# Postgres: згенерована колонка search_vector з GIN-індексом + pg_trgm для опечаток.
+# SQLite (тести): зовнішні FTS5-таблиці, синхронізовані тригерами.
+# Колонки/таблиці не описані в моделях, бо залежать від діалекту; для існуючих баз див. міграцію.
+
+SEARCH_VECTOR_COLUMNS = {"search_vector"}
+SEARCH_INDEXES = {
+    "ix_wishlists_search_vector", "ix_wishlists_title_trgm",
+    "ix_wish_items_search_vector", "ix_wish_items_title_trgm",
+}
+
+
+def postgres_search_ddl(table: str):
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_title_trgm ON {table} USING GIN (title gin_trgm_ops)",
+    ]
+
+
+def sqlite_search_ddl(table: str):
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(title, description, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+        f"INSERT INTO {fts}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    ]
+
+
+for _table in (WishList.__table__, WishItem.__table__):
+    for _statement in postgres_search_ddl(_table.name):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+    for _statement in sqlite_search_ddl(_table.name):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
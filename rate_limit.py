@@ -0,0 +1,164 @@
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import redis
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from auth import SECRET_KEY, ALGORITHM
+from database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+# Ліміти за замовчуванням: назва -> (місткість бакета, за скільки секунд він наповнюється).
+# Перевизначаються змінними оточення RATE_LIMIT_<NAME>=<capacity>/<seconds>, напр. RATE_LIMIT_LOGIN=10/60
+RATE_LIMITS: Dict[str, Tuple[int, int]] = {
+    "login": (10, 60),
+    "register": (5, 3600),
+    "add_item": (60, 60),
+    "mark_item": (30, 60),
+    "delete_item": (60, 60),
+}
+
+# Одночасні запити на воркер: за замовчуванням не більше, ніж з'єднань у пулі БД
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", DB_POOL_SIZE + DB_MAX_OVERFLOW))
+# bcrypt навантажує CPU, тому /token і /register мають власний менший ліміт
+AUTH_CONCURRENCY = int(os.getenv("AUTH_CONCURRENCY", 4))
+
+REJECTIONS_KEY = "metrics:rejections"
+
+# Token bucket для кількох ключів за один виклик: токен списується лише якщо він є в усіх бакетах.
+# ARGV: місткість, токенів за секунду. Повертає {1, 0} або {0, секунд до повторної спроби}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local ttl = math.ceil(capacity / rate) + 1
+
+local tokens = {}
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    if available < 1 then
+        retry_after = math.max(retry_after, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+
+local allowed = retry_after == 0
+for i, key in ipairs(KEYS) do
+    local available = tokens[i]
+    if allowed then
+        available = available - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(available), 'ts', tostring(now))
+    redis.call('EXPIRE', key, ttl)
+end
+
+if allowed then
+    return {1, 0}
+end
+return {0, math.ceil(retry_after)}
+"""
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+
+def parse_limit(name: str) -> Tuple[int, int]:
+    value = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if not value:
+        return RATE_LIMITS[name]
+    capacity, seconds = value.split("/")
+    return int(capacity), int(seconds)
+
+
+def record_rejection(redis_client: redis.Redis, kind: str, name: str):
+    try:
+        redis_client.hincrby(REJECTIONS_KEY, f"{kind}:{name}", 1)
+    except redis.RedisError:
+        pass
+
+
+def get_rejection_metrics(redis_client: redis.Redis) -> Dict[str, int]:
+    return {key: int(value) for key, value in redis_client.hgetall(REJECTIONS_KEY).items()}
+
+
+def token_subject(token: Optional[str]) -> Optional[str]:
+    # Лише читання sub без звернення до БД; повна перевірка - у get_current_user
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+class RateLimiter:
+    """Залежність FastAPI: token bucket у Redis по IP та (якщо є токен) по користувачу."""
+
+    def __init__(self, redis_client: redis.Redis, name: str, scopes: Sequence[str] = ("ip", "user")):
+        self.redis_client = redis_client
+        self.name = name
+        self.scopes = scopes
+        self.capacity, seconds = parse_limit(name)
+        self.rate = self.capacity / seconds
+        self.script = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+    def keys(self, request: Request, token: Optional[str]):
+        keys = []
+        if "ip" in self.scopes and request.client:
+            keys.append(f"rate_limit:{self.name}:ip:{request.client.host}")
+        if "user" in self.scopes:
+            subject = token_subject(token)
+            if subject:
+                keys.append(f"rate_limit:{self.name}:user:{subject}")
+        return keys
+
+    async def __call__(self, request: Request, token: Optional[str] = Depends(optional_oauth2_scheme)):
+        keys = self.keys(request, token)
+        if not keys:
+            return
+        try:
+            allowed, retry_after = self.script(keys=keys, args=[self.capacity, self.rate])
+        except redis.RedisError:
+            # Redis недоступний - не блокуємо користувачів
+            return
+        if not allowed:
+            record_rejection(self.redis_client, "rate_limit", self.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, int(retry_after)))},
+            )
+
+
+class ConcurrencyLimiter:
+    """Залежність FastAPI: обмежує одночасні запити в межах воркера.
+    Надлишкові запити отримують 503 одразу, а не чекають у черзі на пул БД."""
+
+    in_flight = 0
+
+    def __init__(self, redis_client: redis.Redis, name: str, limit: int = MAX_CONCURRENT_REQUESTS):
+        self.redis_client = redis_client
+        self.name = name
+        self.limit = limit
+        self.route_in_flight = 0
+
+    async def __call__(self):
+        if ConcurrencyLimiter.in_flight >= MAX_CONCURRENT_REQUESTS or self.route_in_flight >= self.limit:
+            record_rejection(self.redis_client, "concurrency", self.name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+        ConcurrencyLimiter.in_flight += 1
+        self.route_in_flight += 1
+        try:
+            yield
+        finally:
+            ConcurrencyLimiter.in_flight -= 1
+            self.route_in_flight -= 1
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -56,6 +56,9 @@ class WishItemResponse(WishItemBase):
     class Config:
         from_attributes = True
 
+class WishListWithItemsResponse(WishListResponse):
+    items: List[WishItemResponse] = []
+
 class WishItemStatusResponse(BaseModel):
     id: int
     item_id: int
@@ -63,6 +66,15 @@ class WishItemStatusResponse(BaseModel):
     marked: bool
     created_at: datetime
     user_name: Optional[str] = None
+    toggle_count: int = 1
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SearchResult(BaseModel):
+    type: Literal["wishlist", "item"]
+    id: int
+    wishlist_id: int
+    title: str
+    description: Optional[str] = None
+    rank: float
@@ -7,6 +7,7 @@ setup(
     install_requires=[
         "fastapi==0.115.0",
         "uvicorn[standard]==0.32.0",
+        "gunicorn==23.0.0",
         "sqlalchemy==2.0.36",
         "alembic==1.13.3",
         "psycopg2-binary==2.9.9",
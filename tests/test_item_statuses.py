@@ -0,0 +1,41 @@
+from crud import get_item_status_page, mark_item_status
+from models import User, WishList, WishItem
+
+
+def create_item_with_history(db, toggles):
+    user = User(email="owner@example.com", full_name="Owner", hashed_password="x")
+    db.add(user)
+    db.commit()
+    wishlist = WishList(title="Birthday", user_id=user.id)
+    db.add(wishlist)
+    db.commit()
+    item = WishItem(title="Book", wishlist_id=wishlist.id)
+    db.add(item)
+    db.commit()
+
+    # Усі рядки отримують однаковий created_at з func.now() - порядок вирішує id
+    statuses = [mark_item_status(db, item_id=item.id, user_id=user.id) for _ in range(toggles)]
+    return item, statuses
+
+
+def test_status_pages_cover_history_once(db):
+    item, statuses = create_item_with_history(db, 5)
+
+    seen = []
+    after = None
+    while True:
+        page = get_item_status_page(db, item.id, limit=2, after=after)
+        if not page:
+            break
+        seen.extend(row.id for row in page)
+        after = (page[-1].created_at, page[-1].id)
+
+    assert seen == sorted((status.id for status in statuses), reverse=True)
+
+
+def test_status_page_since_until(db):
+    item, statuses = create_item_with_history(db, 3)
+    created_at = statuses[0].created_at
+
+    assert len(get_item_status_page(db, item.id, limit=10, since=created_at)) == 3
+    assert get_item_status_page(db, item.id, limit=10, until=created_at) == []